@@ -1,15 +1,16 @@
 use axum::{
+    body::Body,
     extract::{
         ws::{Message, WebSocket, WebSocketUpgrade},
-        Path as AxumPath, State,
+        DefaultBodyLimit, Path as AxumPath, State,
     },
-    http::StatusCode,
+    http::{HeaderMap, StatusCode},
     response::{Json, Response},
     routing::{get, post},
     Router,
 };
 use serde_json::json;
-use bytes::Bytes;
+use bytes::{Buf, Bytes, BytesMut};
 use futures_util::{SinkExt, StreamExt};
 use std::{
     collections::HashMap,
@@ -23,6 +24,16 @@ use tracing::{error, info, warn};
 // Tipe data biner kita (smart pointer, copy-on-write)
 type Frame = Bytes;
 
+// Panjang prefix per frame pada streaming ingest (u32 big-endian)
+const STREAM_LENGTH_PREFIX: usize = 4;
+
+// Batas ukuran satu frame pada streaming ingest; prefix yang lebih besar dianggap korup
+const MAX_STREAM_FRAME_SIZE: usize = 16 * 1024 * 1024;
+
+// Batas body POST /ingest/:stream_id (default axum 2 MB terlalu kecil untuk batch ingest:
+// INGEST_BATCH=K frame 250 KB sudah 413 di atas K≈8). 64 MiB cukup untuk batch puluhan frame
+const MAX_INGEST_BODY_SIZE: usize = 64 * 1024 * 1024;
+
 // Peta (map) dari Stream ID (String) ke Pengirim (Sender) siarannya
 type StreamMap = Arc<Mutex<HashMap<String, broadcast::Sender<Frame>>>>;
 
@@ -32,20 +43,15 @@ struct AppState {
     streams: StreamMap,
 }
 
-/// Handler untuk POST /ingest/:stream_id
-/// Menerima frame biner dari producer dan menyiarkannya ke channel
-async fn http_ingest_handler(
-    AxumPath(stream_id): AxumPath<String>,
-    State(state): State<AppState>,
-    body: Bytes,
-) -> StatusCode {
+/// Siarkan satu frame ke channel stream_id (dipakai oleh kedua ingest handler)
+fn broadcast_frame(state: &AppState, stream_id: &str, frame: Frame) -> StatusCode {
     // Kunci (lock) HashMap
     let map = state.streams.lock().unwrap();
     
     // Cari channel yang ada
-    if let Some(tx) = map.get(&stream_id) {
+    if let Some(tx) = map.get(stream_id) {
         // Kirim (siarkan) frame ke semua subscriber
-        match tx.send(body) {
+        match tx.send(frame) {
             Ok(subscriber_count) => {
                 if subscriber_count == 0 {
                     warn!("No WebSocket clients connected for stream: {}", stream_id);
@@ -70,6 +76,108 @@ async fn http_ingest_handler(
     }
 }
 
+// Header batch ingest: jumlah frame length-prefixed di dalam body
+const FRAME_COUNT_HEADER: &str = "x-frame-count";
+
+/// Pisahkan body batch menjadi frame (format prefix sama dengan streaming ingest).
+/// Frame adalah slice dari body (tanpa copy). None jika body tidak berisi tepat `count` frame
+fn split_batch(mut body: Bytes, count: usize) -> Option<Vec<Frame>> {
+    // `count` datang dari client: setiap frame butuh minimal satu prefix, jadi tolak
+    // count yang tidak mungkin sebelum alokasi
+    if count > body.len() / STREAM_LENGTH_PREFIX {
+        return None;
+    }
+    let mut frames = Vec::with_capacity(count);
+    while body.len() >= STREAM_LENGTH_PREFIX {
+        let frame_len = u32::from_be_bytes([body[0], body[1], body[2], body[3]]) as usize;
+        body.advance(STREAM_LENGTH_PREFIX);
+        if frame_len > body.len() {
+            return None;
+        }
+        frames.push(body.split_to(frame_len));
+    }
+    (body.is_empty() && frames.len() == count).then_some(frames)
+}
+
+/// Handler untuk POST /ingest/:stream_id
+/// Menerima frame biner dari producer dan menyiarkannya ke channel.
+/// Dengan header X-Frame-Count, body berisi beberapa frame length-prefixed (batch ingest)
+async fn http_ingest_handler(
+    AxumPath(stream_id): AxumPath<String>,
+    State(state): State<AppState>,
+    headers: HeaderMap,
+    body: Bytes,
+) -> StatusCode {
+    let Some(count) = headers.get(FRAME_COUNT_HEADER) else {
+        return broadcast_frame(&state, &stream_id, body);
+    };
+
+    let frames = count
+        .to_str()
+        .ok()
+        .and_then(|count| count.parse::<usize>().ok())
+        .and_then(|count| split_batch(body, count));
+    let Some(frames) = frames else {
+        warn!("Malformed batch ingest for stream: {} (X-Frame-Count: {:?})", stream_id, count);
+        return StatusCode::BAD_REQUEST;
+    };
+
+    // Status batch = status frame terakhir (semua frame menuju channel yang sama)
+    let mut status = StatusCode::ACCEPTED;
+    for frame in frames {
+        status = broadcast_frame(&state, &stream_id, frame);
+    }
+    status
+}
+
+/// Handler untuk POST /ingest/:stream_id/stream
+/// Satu request long-lived: body berisi frame berurutan, masing-masing diawali panjang
+/// 4 byte (u32 big-endian). Setiap frame disiarkan begitu lengkap, tanpa menunggu body selesai
+async fn http_ingest_stream_handler(
+    AxumPath(stream_id): AxumPath<String>,
+    State(state): State<AppState>,
+    body: Body,
+) -> StatusCode {
+    info!("Streaming ingest opened for stream: {}", stream_id);
+    let mut chunks = body.into_data_stream();
+    let mut buf = BytesMut::new();
+    let mut frame_count: u64 = 0;
+
+    while let Some(chunk) = chunks.next().await {
+        let chunk = match chunk {
+            Ok(chunk) => chunk,
+            Err(e) => {
+                warn!("Streaming ingest interrupted for stream: {} ({})", stream_id, e);
+                return StatusCode::BAD_REQUEST;
+            }
+        };
+        buf.extend_from_slice(&chunk);
+
+        // Pisahkan semua frame yang sudah lengkap di buffer
+        while buf.len() >= STREAM_LENGTH_PREFIX {
+            let frame_len = u32::from_be_bytes([buf[0], buf[1], buf[2], buf[3]]) as usize;
+            if frame_len > MAX_STREAM_FRAME_SIZE {
+                error!("Streaming ingest frame too large for stream: {} ({} bytes)", stream_id, frame_len);
+                return StatusCode::PAYLOAD_TOO_LARGE;
+            }
+            if buf.len() < STREAM_LENGTH_PREFIX + frame_len {
+                break;
+            }
+            buf.advance(STREAM_LENGTH_PREFIX);
+            let frame = buf.split_to(frame_len).freeze();
+            broadcast_frame(&state, &stream_id, frame);
+            frame_count += 1;
+        }
+    }
+
+    if !buf.is_empty() {
+        warn!("Streaming ingest for stream: {} ended with {} bytes of an incomplete frame", stream_id, buf.len());
+        return StatusCode::BAD_REQUEST;
+    }
+    info!("Streaming ingest closed for stream: {} ({} frames)", stream_id, frame_count);
+    StatusCode::OK
+}
+
 /// Handler untuk GET / atau /health
 /// Health check endpoint untuk monitoring service status
 async fn health_handler(State(state): State<AppState>) -> Json<serde_json::Value> {
@@ -85,6 +193,7 @@ async fn health_handler(State(state): State<AppState>) -> Json<serde_json::Value
         "total_connections": total_channels,
         "endpoints": {
             "ingest": "POST /ingest/:stream_id",
+            "ingest_stream": "POST /ingest/:stream_id/stream",
             "websocket": "GET /ws/:stream_id",
             "health": "GET /health"
         }
@@ -99,6 +208,8 @@ async fn websocket_handler(
     State(state): State<AppState>,
 ) -> Response {
     info!("WebSocket connection request for stream: {}", stream_id);
+    // Tanpa permessage-deflate: axum/tungstenite tidak menegosiasikannya, dan frame
+    // WebP/JPEG sudah terkompresi, jadi deflate hanya membuang CPU
     ws.on_upgrade(move |socket| websocket_connection(socket, stream_id, state))
 }
 
@@ -229,7 +340,11 @@ async fn main() -> Result<(), Box<dyn std::error::Error>> {
     let app = Router::new()
         .route("/", get(health_handler))
         .route("/health", get(health_handler))
-        .route("/ingest/:stream_id", post(http_ingest_handler))
+        .route(
+            "/ingest/:stream_id",
+            post(http_ingest_handler).layer(DefaultBodyLimit::max(MAX_INGEST_BODY_SIZE)),
+        )
+        .route("/ingest/:stream_id/stream", post(http_ingest_stream_handler))
         .route("/ws/:stream_id", get(websocket_handler))
         .layer(
             ServiceBuilder::new()
@@ -245,6 +360,7 @@ async fn main() -> Result<(), Box<dyn std::error::Error>> {
     info!("  GET  /                  - Health check endpoint");
     info!("  GET  /health            - Health check endpoint");
     info!("  POST /ingest/:stream_id - Ingest endpoint for producers");
+    info!("  POST /ingest/:stream_id/stream - Streaming ingest (length-prefixed frames, one request)");
     info!("  GET  /ws/:stream_id     - WebSocket endpoint for clients");
     info!("  Note: For HTTPS/HTTP/2, use a reverse proxy (nginx/caddy) in front of this server");
 
@@ -323,4 +439,174 @@ mod tests {
         // Should return 200 OK when channel exists (even with no subscribers)
         assert_eq!(response.status(), StatusCode::OK);
     }
+
+    #[tokio::test]
+    async fn test_ingest_handler_splits_batch() {
+        let state = AppState {
+            streams: Arc::new(Mutex::new(HashMap::new())),
+        };
+
+        // Create a channel for the stream and keep a subscriber
+        let (tx, mut rx) = broadcast::channel::<Frame>(128);
+        state.streams.lock().unwrap().insert("test_stream".to_string(), tx);
+
+        let app = Router::new()
+            .route("/ingest/:stream_id", post(http_ingest_handler))
+            .with_state(state);
+
+        // Two length-prefixed frames in one request
+        let mut body = Vec::new();
+        for frame in [&b"frame one"[..], &b"frame two!"[..]] {
+            body.extend_from_slice(&(frame.len() as u32).to_be_bytes());
+            body.extend_from_slice(frame);
+        }
+
+        let response = app
+            .clone()
+            .oneshot(
+                Request::builder()
+                    .method("POST")
+                    .uri("/ingest/test_stream")
+                    .header("content-type", "application/octet-stream")
+                    .header("x-frame-count", "2")
+                    .body(Body::from(body.clone()))
+                    .unwrap(),
+            )
+            .await
+            .unwrap();
+
+        assert_eq!(response.status(), StatusCode::OK);
+        assert_eq!(rx.recv().await.unwrap(), Bytes::from_static(b"frame one"));
+        assert_eq!(rx.recv().await.unwrap(), Bytes::from_static(b"frame two!"));
+
+        // Count that doesn't match the body is rejected
+        let response = app
+            .oneshot(
+                Request::builder()
+                    .method("POST")
+                    .uri("/ingest/test_stream")
+                    .header("x-frame-count", "3")
+                    .body(Body::from(body))
+                    .unwrap(),
+            )
+            .await
+            .unwrap();
+
+        assert_eq!(response.status(), StatusCode::BAD_REQUEST);
+    }
+
+    #[test]
+    fn test_split_batch_rejects_malformed_body() {
+        let mut body = Vec::new();
+        for frame in [&b"frame one"[..], &b"frame two!"[..]] {
+            body.extend_from_slice(&(frame.len() as u32).to_be_bytes());
+            body.extend_from_slice(frame);
+        }
+        let body = Bytes::from(body);
+
+        let frames = split_batch(body.clone(), 2).unwrap();
+        assert_eq!(frames, vec![Bytes::from_static(b"frame one"), Bytes::from_static(b"frame two!")]);
+
+        // Truncated prefix: the body ends in the middle of the second length prefix
+        let truncated = body.slice(..4 + 9 + 2);
+        assert!(split_batch(truncated, 2).is_none());
+
+        // Prefix points past the end of the body
+        let truncated = body.slice(..body.len() - 1);
+        assert!(split_batch(truncated, 2).is_none());
+
+        // Count mismatch
+        assert!(split_batch(body.clone(), 1).is_none());
+        assert!(split_batch(body.clone(), 3).is_none());
+
+        // Oversized count is rejected before allocating
+        assert!(split_batch(body, usize::MAX).is_none());
+    }
+
+    #[tokio::test]
+    async fn test_ingest_stream_handler_splits_frames() {
+        let state = AppState {
+            streams: Arc::new(Mutex::new(HashMap::new())),
+        };
+
+        // Create a channel for the stream and keep a subscriber
+        let (tx, mut rx) = broadcast::channel::<Frame>(128);
+        state.streams.lock().unwrap().insert("test_stream".to_string(), tx);
+
+        let app = Router::new()
+            .route("/ingest/:stream_id/stream", post(http_ingest_stream_handler))
+            .with_state(state);
+
+        // Two length-prefixed frames in one body
+        let mut body = Vec::new();
+        for frame in [&b"frame one"[..], &b"frame two!"[..]] {
+            body.extend_from_slice(&(frame.len() as u32).to_be_bytes());
+            body.extend_from_slice(frame);
+        }
+
+        let response = app
+            .oneshot(
+                Request::builder()
+                    .method("POST")
+                    .uri("/ingest/test_stream/stream")
+                    .header("content-type", "application/octet-stream")
+                    .body(Body::from(body))
+                    .unwrap(),
+            )
+            .await
+            .unwrap();
+
+        assert_eq!(response.status(), StatusCode::OK);
+        assert_eq!(rx.recv().await.unwrap(), Bytes::from_static(b"frame one"));
+        assert_eq!(rx.recv().await.unwrap(), Bytes::from_static(b"frame two!"));
+    }
+
+    #[tokio::test]
+    async fn test_ingest_stream_handler_frame_split_across_chunks() {
+        let state = AppState {
+            streams: Arc::new(Mutex::new(HashMap::new())),
+        };
+
+        // Create a channel for the stream and keep a subscriber
+        let (tx, mut rx) = broadcast::channel::<Frame>(128);
+        state.streams.lock().unwrap().insert("test_stream".to_string(), tx);
+
+        let app = Router::new()
+            .route("/ingest/:stream_id/stream", post(http_ingest_stream_handler))
+            .with_state(state);
+
+        let frames = [&b"frame one"[..], &b"frame two!"[..], &b"frame three"[..]];
+        let mut body = Vec::new();
+        for frame in frames {
+            body.extend_from_slice(&(frame.len() as u32).to_be_bytes());
+            body.extend_from_slice(frame);
+        }
+
+        // Chunk boundaries inside the first frame's payload, inside the second frame's
+        // length prefix, and one single-byte chunk
+        let cuts = [0, 6, 15, 16, 20, body.len()];
+        let chunks: Vec<Result<Bytes, std::io::Error>> = cuts
+            .windows(2)
+            .map(|cut| Ok(Bytes::copy_from_slice(&body[cut[0]..cut[1]])))
+            .collect();
+
+        let response = app
+            .oneshot(
+                Request::builder()
+                    .method("POST")
+                    .uri("/ingest/test_stream/stream")
+                    .header("content-type", "application/octet-stream")
+                    .body(Body::from_stream(futures_util::stream::iter(chunks)))
+                    .unwrap(),
+            )
+            .await
+            .unwrap();
+
+        assert_eq!(response.status(), StatusCode::OK);
+        for frame in frames {
+            assert_eq!(rx.recv().await.unwrap(), Bytes::copy_from_slice(frame));
+        }
+        // Every frame is broadcast exactly once
+        assert!(matches!(rx.try_recv(), Err(broadcast::error::TryRecvError::Empty)));
+    }
 }
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Per-frame latency tracking and adaptive encode quality
+FrameLatency averages encode and send time; AdaptiveQuality steps WebP/JPEG quality
+down (and finally the resolution) while encode + send time per frame doesn't fit the
+frame interval, and back up once it fits with room to spare
+"""
+
+DEFAULT_EWMA_ALPHA = 0.2  # Weight of the newest sample in the encode/send time averages
+DEFAULT_QUALITY_STEP = 5
+DEFAULT_MIN_QUALITY = 40
+DEFAULT_OVERLOAD_RATIO = 0.9  # Over budget: encode + send > 90% of the frame interval
+DEFAULT_RECOVER_RATIO = 0.5  # Room to spare: encode + send < 50% of the frame interval
+DEFAULT_OVERLOAD_FRAMES = 10  # Consecutive frames over budget before stepping down
+DEFAULT_RECOVER_FRAMES = 30  # Consecutive frames with room to spare before stepping up
+
+
+class FrameLatency:
+    """
+    EWMAs of per-frame encode time and send time (milliseconds)
+
+    observe_encode() is called from EncodeThread and observe_send() from SendThread;
+    readers on other threads only need a recent value (plain float updates, no lock needed).
+    """
+
+    def __init__(self):
+        self.encode_ms = 0.0
+        self.send_ms = 0.0
+
+    def observe_encode(self, ms: float) -> None:
+        """Add one frame's encode time"""
+        self.encode_ms += DEFAULT_EWMA_ALPHA * (ms - self.encode_ms)
+
+    def observe_send(self, ms: float) -> None:
+        """Add one request's send time (until the broker responded)"""
+        self.send_ms += DEFAULT_EWMA_ALPHA * (ms - self.send_ms)
+
+    @property
+    def total_ms(self) -> float:
+        """Average encode + send time per frame"""
+        return self.encode_ms + self.send_ms
+
+
+class AdaptiveQuality:
+    """
+    Hysteresis controller on the FrameLatency averages
+
+    Stepping down lowers quality by DEFAULT_QUALITY_STEP until min_quality, then
+    switches on downscaling; stepping up undoes that in reverse order.
+    update() is called from EncodeThread once per encoded frame.
+    """
+
+    def __init__(self, latency: FrameLatency, frame_interval: float, max_quality: int,
+                 min_quality: int = DEFAULT_MIN_QUALITY):
+        """
+        Args:
+            latency: Encode/send time averages to steer by
+            frame_interval: Target seconds per frame (1 / TARGET_FPS)
+            max_quality: Configured quality, never exceeded
+            min_quality: Lowest quality before downscaling kicks in
+        """
+        self.latency = latency
+        self.max_quality = max_quality
+        self.min_quality = min(min_quality, max_quality)
+        self.quality = max_quality
+        self.downscale = False
+        self._overload_ms = frame_interval * 1000 * DEFAULT_OVERLOAD_RATIO
+        self._recover_ms = frame_interval * 1000 * DEFAULT_RECOVER_RATIO
+        self._over_count = 0
+        self._under_count = 0
+
+    def update(self) -> bool:
+        """
+        Evaluate the averages once per encoded frame
+
+        Returns:
+            bool: True if quality or downscale changed
+        """
+        total_ms = self.latency.total_ms
+        if total_ms > self._overload_ms:
+            self._over_count += 1
+            self._under_count = 0
+        elif total_ms < self._recover_ms:
+            self._under_count += 1
+            self._over_count = 0
+        else:
+            self._over_count = self._under_count = 0
+
+        if self._over_count >= DEFAULT_OVERLOAD_FRAMES:
+            self._over_count = 0
+            if self.quality > self.min_quality:
+                self.quality = max(self.quality - DEFAULT_QUALITY_STEP, self.min_quality)
+                return True
+            if not self.downscale:
+                self.downscale = True
+                return True
+        elif self._under_count >= DEFAULT_RECOVER_FRAMES:
+            self._under_count = 0
+            if self.downscale:
+                self.downscale = False
+                return True
+            if self.quality < self.max_quality:
+                self.quality = min(self.quality + DEFAULT_QUALITY_STEP, self.max_quality)
+                return True
+        return False
@@ -0,0 +1,45 @@
+#!/bin/bash
+# Build libwebp with AVX2 enabled for the direct WebP encoder (webp_encoder.py)
+# Usage: ./build-libwebp.sh [version]
+# Then set LIBWEBP_PATH to the printed library path (in .env or environment)
+
+set -e
+
+cd "$(dirname "$0")"
+
+LIBWEBP_VERSION="${1:-1.4.0}"
+BUILD_DIR="build/libwebp-${LIBWEBP_VERSION}"
+INSTALL_DIR="$(pwd)/lib"
+
+mkdir -p build "$INSTALL_DIR"
+
+# Download source
+if [ ! -d "$BUILD_DIR" ]; then
+    curl -L "https://storage.googleapis.com/downloads.webmproject.org/releases/webp/libwebp-${LIBWEBP_VERSION}.tar.gz" \
+        | tar -xz -C build
+fi
+
+# Configure with AVX2 code paths compiled in (WEBP_HAVE_AVX2)
+cmake -S "$BUILD_DIR" -B "$BUILD_DIR/out" \
+    -DCMAKE_BUILD_TYPE=Release \
+    -DBUILD_SHARED_LIBS=ON \
+    -DCMAKE_C_FLAGS="-O3 -mavx2 -DWEBP_HAVE_AVX2" \
+    -DWEBP_BUILD_ANIM_UTILS=OFF \
+    -DWEBP_BUILD_CWEBP=OFF \
+    -DWEBP_BUILD_DWEBP=OFF \
+    -DWEBP_BUILD_GIF2WEBP=OFF \
+    -DWEBP_BUILD_IMG2WEBP=OFF \
+    -DWEBP_BUILD_VWEBP=OFF \
+    -DWEBP_BUILD_WEBPINFO=OFF \
+    -DWEBP_BUILD_WEBPMUX=OFF \
+    -DWEBP_BUILD_EXTRAS=OFF \
+    -DCMAKE_INSTALL_PREFIX="$INSTALL_DIR"
+
+cmake --build "$BUILD_DIR/out" -j "$(nproc)"
+cmake --install "$BUILD_DIR/out"
+
+echo "libwebp ${LIBWEBP_VERSION} built successfully!"
+echo "  Library: $(ls "$INSTALL_DIR"/lib*/libwebp.so | head -n 1)"
+echo ""
+echo "Add to .env:"
+echo "  LIBWEBP_PATH=$(ls "$INSTALL_DIR"/lib*/libwebp.so | head -n 1)"
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Raw HTTP/2 sender - drives the h2 state machine directly on one socket
+Skips httpx per-request overhead (URL parsing, header dict/Headers build, middleware)
+"""
+
+import collections
+import logging
+import os
+import select
+import socket
+import ssl
+import struct
+import time
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import h2.config
+import h2.connection
+import h2.events
+import h2.exceptions
+import hyperframe.frame
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_RECV_SIZE = 65535
+DEFAULT_ZEROCOPY_MIN_SIZE = 16384  # MSG_ZEROCOPY page pinning only pays off for larger writes
+DEFAULT_ZEROCOPY_DRAIN_TIMEOUT = 0.5  # close(): wait this long for outstanding zerocopy completions
+
+# Linux MSG_ZEROCOPY (>= 4.14), not exported by the socket module
+SO_ZEROCOPY = getattr(socket, "SO_ZEROCOPY", 60)
+MSG_ZEROCOPY = getattr(socket, "MSG_ZEROCOPY", 0x4000000)
+SO_EE_ORIGIN_ZEROCOPY = 5
+SO_EE_CODE_ZEROCOPY_COPIED = 1
+SOCK_EXTENDED_ERR = struct.Struct("=IBBBBII")  # ee_errno, ee_origin, ee_type, ee_code, ee_pad, ee_info, ee_data
+ERRQUEUE_ANCBUF_SIZE = socket.CMSG_SPACE(64)
+
+# OpenSSL 3 SSL_OP_ENABLE_KTLS (exported as ssl.OP_ENABLE_KTLS since Python 3.12)
+OP_ENABLE_KTLS = getattr(ssl, "OP_ENABLE_KTLS", 0x8 if ssl.OPENSSL_VERSION_INFO >= (3,) else 0)
+
+# HTTP/2 frame header: 24-bit length, type, flags, 31-bit stream id (same packing as hyperframe)
+FRAME_HEADER = struct.Struct(">HBBBL")
+FLAG_END_STREAM = 0x1
+
+
+class _Payload:
+    """DATA payload handed to h2 by reference - h2 only needs len() for flow control accounting"""
+
+    __slots__ = ("view",)
+
+    def __init__(self, view: memoryview):
+        self.view = view
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+
+class _SegmentedH2Connection(h2.connection.H2Connection):
+    """
+    H2Connection that keeps DATA payloads out of its output buffer
+
+    h2/hyperframe copy a DATA payload several times while serializing it
+    (tobytes, body join, header + body, output bytearray, data_to_send()).
+    Payloads passed as _Payload are not serialized: only their 9-byte frame
+    header is buffered, and segments_to_send() returns the payload views
+    in order, so the sender can write everything with one vectored sendmsg().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._payloads: List[Tuple[int, memoryview]] = []  # (offset in _data_to_send, payload view)
+
+    def _prepare_for_sending(self, frames) -> None:
+        for frame in frames:
+            if isinstance(frame, hyperframe.frame.DataFrame) and isinstance(frame.data, _Payload):
+                length = len(frame.data)
+                flags = FLAG_END_STREAM if "END_STREAM" in frame.flags else 0
+                self._data_to_send += FRAME_HEADER.pack(
+                    (length >> 8) & 0xFFFF, length & 0xFF, frame.type, flags, frame.stream_id & 0x7FFFFFFF
+                )
+                self._payloads.append((len(self._data_to_send), frame.data.view))
+            else:
+                super()._prepare_for_sending([frame])
+
+    def segments_to_send(self) -> List[memoryview]:
+        """Return buffered frames as a list of buffers (control bytes interleaved with payload views)"""
+        data = memoryview(self.data_to_send())
+        segments = []
+        start = 0
+        for offset, payload in self._payloads:
+            if offset > start:
+                segments.append(data[start:offset])
+            segments.append(payload)
+            start = offset
+        if start < len(data):
+            segments.append(data[start:])
+        self._payloads.clear()
+        return segments
+
+
+class H2Sender:
+    """
+    Single-connection HTTP/2 client for POST /ingest/:stream_id
+
+    The request header list is built once; HPACK indexes it after the first
+    request so every following HEADERS frame is only a few bytes. Requests are
+    fire-and-forget: responses are processed as they arrive and non-2xx
+    statuses are logged.
+    """
+
+    def __init__(self, broker_url: str, path: str, content_type: str = "image/webp", verify_ssl: bool = False,
+                 on_send_time: Optional[Callable[[float], None]] = None):
+        """
+        Args:
+            broker_url: Broker base URL (https:// uses TLS+ALPN h2, http:// uses h2c prior knowledge)
+            path: Request path, e.g. /ingest/stream1
+            content_type: Content-Type of the payload
+            verify_ssl: Verify broker certificate (False for self-signed)
+            on_send_time: Called with each request's send time in milliseconds, from
+                HEADERS until the broker's response ended (when the response is processed)
+        """
+        url = urlsplit(broker_url)
+        self.use_tls = url.scheme == "https"
+        self.host = url.hostname or "localhost"
+        self.port = url.port or (443 if self.use_tls else 80)
+        self.verify_ssl = verify_ssl
+        # Built once: creating an SSLContext loads the CA store, too slow to repeat on every reconnect
+        self._ssl_context = self._create_ssl_context() if self.use_tls else None
+
+        # Static request headers (identical for every frame)
+        self._headers: List[Tuple[bytes, bytes]] = [
+            (b":method", b"POST"),
+            (b":scheme", url.scheme.encode()),
+            (b":authority", url.netloc.encode()),
+            (b":path", path.encode()),
+            (b"content-type", content_type.encode()),
+        ]
+
+        self.sock: Optional[socket.socket] = None
+        self.conn: Optional[_SegmentedH2Connection] = None
+        self._statuses: Dict[int, int] = {}
+        self._on_send_time = on_send_time
+        self._start_ns: Dict[int, int] = {}  # stream id -> monotonic_ns when HEADERS was queued
+        
+        # MSG_ZEROCOPY state (plain TCP only): buffers must stay alive until the kernel
+        # reports completion on the socket error queue
+        self._zerocopy = False
+        self._zc_seq = 0
+        self._zc_inflight: Deque[Tuple[int, List[memoryview]]] = collections.deque()
+        self._errqueue_poll: Optional[select.poll] = None
+        # Readability check for _receive(block=False); see _data_available()
+        self._recv_poll: Optional[select.poll] = None
+        
+        # kTLS: when the kernel encrypts TLS records (TLS_TX), plaintext can be written to the
+        # raw fd with sendmsg() like plain TCP; _tx_sock is a dup of the TLS socket's fd
+        self._tx_sock: Optional[socket.socket] = None
+
+    def _create_ssl_context(self) -> ssl.SSLContext:
+        """TLS context for the broker connection (ALPN h2, kTLS if available)"""
+        context = ssl.create_default_context()
+        if not self.verify_ssl:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        context.set_alpn_protocols(["h2"])
+        # Let OpenSSL hand AES-GCM to the kernel (kTLS) if it was built with it and the
+        # `tls` module is loaded; the handshake itself stays in OpenSSL
+        context.options |= OP_ENABLE_KTLS
+        return context
+
+    def connect(self) -> None:
+        """Open socket, negotiate HTTP/2 and send connection preface + SETTINGS"""
+        sock = socket.create_connection((self.host, self.port), timeout=DEFAULT_CONNECT_TIMEOUT)
+        # HEADERS and DATA go out in separate writes: without TCP_NODELAY, Nagle holds the tail
+        # of a frame until the previous segment is ACKed (asyncio/httpx sockets already set it).
+        # SO_SNDBUF stays untouched: a fixed value disables the kernel's send buffer autotuning
+        # (up to tcp_wmem max, 4 MiB by default) and is clamped to wmem_max, usually far below that
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.use_tls:
+            sock = self._ssl_context.wrap_socket(sock, server_hostname=self.host)
+            if sock.selected_alpn_protocol() != "h2":
+                sock.close()
+                raise ConnectionError("Broker did not negotiate HTTP/2 (ALPN)")
+            self._tx_sock = self._ktls_tx_socket(sock)
+        else:
+            self._enable_zerocopy(sock)
+            self._tx_sock = sock
+
+        conn = _SegmentedH2Connection(h2.config.H2Configuration(client_side=True, header_encoding=None))
+        conn.initiate_connection()
+        sock.sendall(conn.data_to_send())
+
+        self.sock, self.conn = sock, conn
+        self._statuses.clear()
+        self._start_ns.clear()
+        self._recv_poll = select.poll()
+        self._recv_poll.register(sock, select.POLLIN)
+        logger.info("Raw HTTP/2 connection established to %s:%d%s%s", self.host, self.port,
+                    " (MSG_ZEROCOPY)" if self._zerocopy else "",
+                    " (kTLS TX)" if self.use_tls and self._tx_sock is not None else "")
+
+    @staticmethod
+    def _ktls_tx_socket(sock: ssl.SSLSocket) -> Optional[socket.socket]:
+        """
+        Return a plain socket on a dup of the TLS fd if OpenSSL enabled kTLS for sending, else None
+
+        Only detectable on Python >= 3.12 (SSLObject.uses_ktls_for_send); older
+        versions keep writing through SSLSocket even if the kernel does the encryption.
+        """
+        uses_ktls_for_send = getattr(sock._sslobj, "uses_ktls_for_send", None)
+        if uses_ktls_for_send is None or not uses_ktls_for_send():
+            return None
+        tx_sock = socket.socket(sock.family, sock.type, sock.proto, fileno=os.dup(sock.fileno()))
+        tx_sock.settimeout(sock.gettimeout())
+        return tx_sock
+
+    def _enable_zerocopy(self, sock: socket.socket) -> None:
+        """Enable SO_ZEROCOPY on a plain TCP socket (TLS encrypts in userspace, so it cannot apply there)"""
+        self._zc_seq = 0
+        self._zc_inflight.clear()
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_ZEROCOPY, 1)
+        except OSError as e:
+            logger.debug("SO_ZEROCOPY not available: %s", e)
+            self._zerocopy = False
+            return
+        self._zerocopy = True
+        # Error queue notifications raise POLLERR; poll(0) checks for them without blocking
+        self._errqueue_poll = select.poll()
+        self._errqueue_poll.register(sock, select.POLLERR)
+
+    def send(self, payload) -> bool:
+        """
+        Send payload as one POST request (connects lazily, reconnects after errors)
+
+        Args:
+            payload: bytes-like request body
+
+        Returns:
+            bool: True if the request was written to the socket
+        """
+        try:
+            if self.conn is None:
+                self.connect()
+
+            conn = self.conn
+            # Respect the broker's SETTINGS_MAX_CONCURRENT_STREAMS
+            while conn.open_outbound_streams >= conn.remote_settings.max_concurrent_streams:
+                self._receive(block=True)
+
+            stream_id = conn.get_next_available_stream_id()
+            if self._on_send_time is not None:
+                self._start_ns[stream_id] = time.monotonic_ns()
+            conn.send_headers(stream_id, self._headers, end_stream=False)
+
+            view = memoryview(payload)
+            offset = 0
+            while offset < len(view):
+                # Flow control: wait for WINDOW_UPDATE if the window is exhausted
+                window = min(conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size)
+                if window <= 0:
+                    self._flush()
+                    self._receive(block=True)
+                    continue
+                chunk = view[offset:offset + window]
+                offset += len(chunk)
+                conn.send_data(stream_id, _Payload(chunk), end_stream=offset >= len(view))
+            if not view:
+                conn.end_stream(stream_id)
+
+            self._flush()
+            self._receive(block=False)
+            return True
+        except (OSError, ConnectionError, h2.exceptions.ProtocolError) as e:
+            logger.error("Raw HTTP/2 send error: %s", e)
+            self.close()
+            return False
+
+    def _flush(self) -> None:
+        """Write buffered frames; payloads go to the socket straight from the caller's buffer"""
+        segments = self.conn.segments_to_send()
+        if not segments:
+            return
+        if self._tx_sock is None:
+            # Userspace TLS: SSLSocket has no sendmsg(); write segment by segment (still no join copy)
+            for segment in segments:
+                self.sock.sendall(segment)
+            return
+
+        zerocopy = self._zerocopy and sum(len(s) for s in segments) >= DEFAULT_ZEROCOPY_MIN_SIZE
+        flags = MSG_ZEROCOPY if zerocopy else 0
+        pending = list(segments)
+        while pending:
+            sent = self._tx_sock.sendmsg(pending, (), flags)
+            if zerocopy and sent > 0:
+                # Each successful zerocopy sendmsg() gets the next completion sequence number
+                self._zc_inflight.append((self._zc_seq, segments))
+                self._zc_seq = (self._zc_seq + 1) & 0xFFFFFFFF
+            while pending and sent >= len(pending[0]):
+                sent -= len(pending[0])
+                pending.pop(0)
+            if sent:
+                pending[0] = pending[0][sent:]
+
+        if self._zc_inflight:
+            self._reap_zerocopy()
+
+    def _reap_zerocopy(self) -> None:
+        """Release buffers the kernel has finished with (MSG_ZEROCOPY completions on the error queue)"""
+        while self._zc_inflight and self._errqueue_poll.poll(0):
+            _, ancdata, _, _ = self.sock.recvmsg(0, ERRQUEUE_ANCBUF_SIZE, socket.MSG_ERRQUEUE)
+            for _level, _type, data in ancdata:
+                _errno, origin, _, code, _, _lo, hi = SOCK_EXTENDED_ERR.unpack_from(data)
+                if origin != SO_EE_ORIGIN_ZEROCOPY:
+                    continue
+                if code & SO_EE_CODE_ZEROCOPY_COPIED and self._zerocopy:
+                    # Kernel had to copy anyway (e.g. loopback, NIC without scatter-gather):
+                    # zerocopy only adds overhead on this route, so stop using it
+                    logger.info("MSG_ZEROCOPY not supported on this route (kernel copied), disabling")
+                    self._zerocopy = False
+                # Completions cover the range [lo, hi]; sends complete in order
+                while self._zc_inflight and ((hi - self._zc_inflight[0][0]) & 0xFFFFFFFF) < 0x80000000:
+                    self._zc_inflight.popleft()
+
+    def _data_available(self) -> bool:
+        """
+        True if recv() would not block
+
+        Only POLLIN counts: with SO_ZEROCOPY, queued completions raise POLLERR, which
+        select() reports as readable although there is no data to recv()
+        """
+        if self.use_tls and self.sock.pending():
+            return True
+        return any(events & select.POLLIN for _, events in self._recv_poll.poll(0))
+
+    def _receive(self, block: bool) -> None:
+        """Read and process frames from the broker (responses, WINDOW_UPDATE, SETTINGS)"""
+        if not block and not self._data_available():
+            return
+
+        data = self.sock.recv(DEFAULT_RECV_SIZE)
+        if not data:
+            raise ConnectionError("Broker closed the connection")
+
+        for event in self.conn.receive_data(data):
+            if isinstance(event, h2.events.ResponseReceived):
+                self._statuses[event.stream_id] = int(dict(event.headers)[b":status"])
+            elif isinstance(event, h2.events.DataReceived):
+                self.conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, h2.events.StreamEnded):
+                status = self._statuses.pop(event.stream_id, None)
+                if status is not None and status >= 300:
+                    logger.warning("Server returned status %s", status)
+                start_ns = self._start_ns.pop(event.stream_id, None)
+                if start_ns is not None:
+                    self._on_send_time((time.monotonic_ns() - start_ns) / 1e6)
+            elif isinstance(event, h2.events.StreamReset):
+                self._statuses.pop(event.stream_id, None)
+                self._start_ns.pop(event.stream_id, None)
+                logger.warning("Stream %d reset by broker (error code %s)", event.stream_id, event.error_code)
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                raise ConnectionError(f"Broker sent GOAWAY (error code {event.error_code})")
+
+        # SETTINGS ACK, WINDOW_UPDATE for received data, PING ACK
+        self._flush()
+
+    def _drain_zerocopy(self) -> bool:
+        """
+        Wait up to DEFAULT_ZEROCOPY_DRAIN_TIMEOUT for the kernel to finish with in-flight buffers
+
+        Returns:
+            bool: True if no zerocopy send is outstanding anymore
+        """
+        deadline = time.monotonic() + DEFAULT_ZEROCOPY_DRAIN_TIMEOUT
+        try:
+            while self._zc_inflight:
+                timeout_ms = (deadline - time.monotonic()) * 1000
+                if timeout_ms <= 0 or not self._errqueue_poll.poll(timeout_ms):
+                    break
+                self._reap_zerocopy()
+        except OSError:
+            pass
+        return not self._zc_inflight
+
+    def close(self) -> None:
+        """Close the connection (a new one is opened on the next send)"""
+        if self.conn is not None and self.sock is not None:
+            try:
+                self.conn.close_connection()
+                self._flush()
+            except (OSError, h2.exceptions.ProtocolError):
+                pass
+        if self._zc_inflight and self.sock is not None and not self._drain_zerocopy():
+            # close() doesn't cancel queued data and the kernel still reads the pinned pages;
+            # the buffers are released below (the JPEG pool may reuse them), so abort the
+            # connection (RST, SO_LINGER 0) instead of sending pages that may be overwritten
+            logger.warning("Closing with %d zerocopy sends outstanding, resetting the connection",
+                           len(self._zc_inflight))
+            try:
+                self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            except OSError:
+                pass
+        if self._tx_sock is not None and self._tx_sock is not self.sock:
+            self._tx_sock.close()
+        self._tx_sock = None
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = None
+        self.conn = None
+        self._zerocopy = False
+        self._zc_inflight.clear()
+        self._errqueue_poll = None
+        self._recv_poll = None
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+HTTP/3 (QUIC) sender using aioquic
+Each frame is sent on its own QUIC stream, so a lost UDP packet only delays
+that frame instead of stalling every stream on the connection (no TCP head-of-line blocking)
+"""
+
+import asyncio
+import contextlib
+import logging
+import ssl
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Try to import aioquic, H3Sender is unavailable if not installed
+try:
+    from aioquic.asyncio import connect  # type: ignore
+    from aioquic.asyncio.protocol import QuicConnectionProtocol  # type: ignore
+    from aioquic.h3.connection import H3_ALPN, H3Connection  # type: ignore
+    from aioquic.h3.events import DataReceived, H3Event, HeadersReceived  # type: ignore
+    from aioquic.quic.configuration import QuicConfiguration  # type: ignore
+    from aioquic.quic.events import ConnectionTerminated, QuicEvent  # type: ignore
+    HAVE_AIOQUIC = True
+except ImportError:
+    HAVE_AIOQUIC = False
+    QuicConnectionProtocol = object
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_H3_PORT = 443
+DEFAULT_H3_TIMEOUT = 10.0
+
+
+class H3ClientProtocol(QuicConnectionProtocol):
+    """QUIC connection protocol that maps HTTP/3 responses back to the waiting request"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._http = H3Connection(self._quic)
+        self._statuses: Dict[int, int] = {}
+        self._waiters: Dict[int, asyncio.Future] = {}
+
+    async def post(self, headers: List[Tuple[bytes, bytes]], payload: bytes) -> int:
+        """Send one request on a new stream and wait for its response status"""
+        stream_id = self._quic.get_next_available_stream_id()
+        self._http.send_headers(stream_id, headers, end_stream=False)
+        self._http.send_data(stream_id, payload, end_stream=True)
+
+        waiter = self._loop.create_future()
+        self._waiters[stream_id] = waiter
+        self.transmit()
+        return await waiter
+
+    def http_event_received(self, event: "H3Event") -> None:
+        if isinstance(event, HeadersReceived):
+            self._statuses[event.stream_id] = int(dict(event.headers)[b":status"])
+        if isinstance(event, (HeadersReceived, DataReceived)) and event.stream_ended:
+            status = self._statuses.pop(event.stream_id, 0)
+            waiter = self._waiters.pop(event.stream_id, None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(status)
+
+    def quic_event_received(self, event: "QuicEvent") -> None:
+        if isinstance(event, ConnectionTerminated):
+            for waiter in self._waiters.values():
+                if not waiter.done():
+                    waiter.set_exception(ConnectionError(f"QUIC connection terminated: {event.reason_phrase}"))
+            self._waiters.clear()
+        for http_event in self._http.handle_event(event):
+            self.http_event_received(http_event)
+
+
+class H3Sender:
+    """Single QUIC connection HTTP/3 client for POST /ingest/:stream_id (connects lazily, reconnects after errors)"""
+
+    def __init__(self, broker_url: str, path: str, content_type: str = "image/webp", verify_ssl: bool = False):
+        """
+        Args:
+            broker_url: Broker base URL (https://, QUIC on the same port over UDP)
+            path: Request path, e.g. /ingest/stream1
+            content_type: Content-Type of the payload
+            verify_ssl: Verify broker certificate (False for self-signed)
+        """
+        if not HAVE_AIOQUIC:
+            raise RuntimeError("aioquic is not installed")
+
+        url = urlsplit(broker_url)
+        self.host = url.hostname or "localhost"
+        self.port = url.port or DEFAULT_H3_PORT
+        self.verify_ssl = verify_ssl
+        # Shared by every (re)connect instead of rebuilding the TLS configuration each time
+        self._configuration = QuicConfiguration(alpn_protocols=H3_ALPN, is_client=True)
+        if not verify_ssl:
+            self._configuration.verify_mode = ssl.CERT_NONE
+        self._headers: List[Tuple[bytes, bytes]] = [
+            (b":method", b"POST"),
+            (b":scheme", b"https"),
+            (b":authority", url.netloc.encode()),
+            (b":path", path.encode()),
+            (b"content-type", content_type.encode()),
+        ]
+        self._protocol: Optional[H3ClientProtocol] = None
+        self._exit_stack: Optional[contextlib.AsyncExitStack] = None
+        self._connect_lock = asyncio.Lock()  # Concurrent sends must not open several connections
+        self.ever_connected = False  # False while QUIC never got through (e.g. UDP blocked), see fallback in main
+
+    async def connect(self) -> None:
+        """Open the QUIC connection and complete the handshake"""
+        self._exit_stack = contextlib.AsyncExitStack()
+        self._protocol = await self._exit_stack.enter_async_context(
+            connect(self.host, self.port, configuration=self._configuration, create_protocol=H3ClientProtocol)
+        )
+        self.ever_connected = True
+        logger.info("HTTP/3 (QUIC) connection established to %s:%d", self.host, self.port)
+
+    async def send(self, payload) -> int:
+        """
+        Send payload as one POST request
+
+        Returns:
+            int: HTTP status code, or 0 if the request failed
+        """
+        try:
+            async with self._connect_lock:
+                if self._protocol is None:
+                    await asyncio.wait_for(self.connect(), DEFAULT_H3_TIMEOUT)
+            return await asyncio.wait_for(self._protocol.post(self._headers, bytes(payload)), DEFAULT_H3_TIMEOUT)
+        except (OSError, ConnectionError, asyncio.TimeoutError) as e:
+            logger.error("HTTP/3 send error: %r", e)
+            await self.close()
+            return 0
+
+    async def close(self) -> None:
+        """Close the QUIC connection"""
+        exit_stack, self._exit_stack, self._protocol = self._exit_stack, None, None
+        if exit_stack is not None:
+            with contextlib.suppress(Exception):
+                await exit_stack.aclose()
@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+RTSP capture backends - OpenCV (default, hardware decode if available), OpenCV+GStreamer (NVDEC), PyAV (hwaccel decode),
+GStreamer (hardware decoder element) and GStreamer with a hardware JPEG encoder (nvjpegenc / vaapijpegenc)
+All backends expose the same grab()/retrieve() interface used by RTSPProducer.run()
+"""
+
+import logging
+import os
+from typing import NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Try to import PyAV, PyAVBackend is unavailable if not installed
+try:
+    import av  # type: ignore
+except ImportError:
+    av = None
+
+# Try to import GStreamer bindings, GstBackend is unavailable if not installed
+try:
+    import gi  # type: ignore
+    gi.require_version("Gst", "1.0")
+    from gi.repository import Gst  # type: ignore
+except (ImportError, ValueError):
+    Gst = None
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_RTSP_BUFFER_SIZE = 1
+# FFmpeg demuxer options for cv2.VideoCapture (CAP_PROP_BUFFERSIZE is ignored by the RTSP demuxer):
+# TCP transport, max 100ms reorder delay, no input buffering, low-delay decoding
+DEFAULT_FFMPEG_CAPTURE_OPTIONS = "rtsp_transport;tcp|max_delay;100000|fflags;nobuffer|flags;low_delay"
+# Same low-latency settings for PyAV (applied to the demuxer and the decoder)
+DEFAULT_PYAV_OPTIONS = {"rtsp_transport": "tcp", "max_delay": "100000", "fflags": "nobuffer", "flags": "low_delay"}
+DEFAULT_PYAV_HWACCEL = "cuda"
+DEFAULT_OPENCV_HWACCEL = "any"  # cv2.VIDEO_ACCELERATION_ANY: hardware decode if the build/host has one, else software
+DEFAULT_GST_DECODER = "vaapih264dec"
+DEFAULT_CUDA_GST_DECODER = "nvv4l2decoder"
+DEFAULT_GST_PULL_TIMEOUT_NS = 1_000_000_000  # 1 second
+DEFAULT_GST_JPEG_ENCODER = "nvjpegenc"
+DEFAULT_GST_JPEG_QUALITY = 75
+# Decode + conversion feeding each hardware JPEG encoder, kept on the same device (no copy to system memory)
+GST_JPEG_DECODE_CHAINS = {
+    "nvjpegenc": "nvv4l2decoder ! nvvidconv ! video/x-raw(memory:NVMM),format=I420",
+    "vaapijpegenc": "vaapih264dec",
+}
+
+
+class YUV420Planes(NamedTuple):
+    """Planar YUV420 frame referencing decoder memory (argument order matches WebPEncoder.encode_yuv420)"""
+    width: int
+    height: int
+    y: object
+    u: object
+    v: object
+    y_stride: int
+    uv_stride: int
+
+
+def _round_up_4(value: int) -> int:
+    return (value + 3) & ~3
+
+
+def i420_planes(data: np.ndarray, width: int, height: int) -> YUV420Planes:
+    """
+    Split a buffer in GStreamer's default I420 layout (rows padded to 4 bytes) into plane views
+
+    Args:
+        data: Contiguous uint8 buffer holding the whole frame
+        width, height: Frame dimensions
+
+    Returns:
+        YUV420Planes: Contiguous 1-D views into data (no copy)
+    """
+    y_stride = _round_up_4(width)
+    uv_stride = _round_up_4((width + 1) // 2)
+    uv_size = uv_stride * ((height + 1) // 2)
+    # The Y plane is allocated for an even number of rows: with an odd height, U starts one row later
+    y_size = y_stride * ((height + 1) & ~1)
+    y = data[:y_stride * height]
+    u = data[y_size:y_size + uv_size]
+    v = data[y_size + uv_size:y_size + 2 * uv_size]
+    return YUV420Planes(width, height, y, u, v, y_stride, uv_stride)
+
+
+def i420_unified(planes: YUV420Planes) -> Tuple[np.ndarray, int]:
+    """
+    Get the frame as one buffer in TurboJPEG's unified planar layout (Y, U, V back-to-back)
+
+    Planes from i420_planes already are that layout with 4-byte row alignment and are
+    returned without copying; other planes (e.g. PyAV, 32/64-byte aligned lines) are
+    packed into a new unpadded buffer.
+
+    Returns:
+        Tuple[np.ndarray, int]: (buffer, row alignment) for TurboJPEG.encode_from_yuv
+    """
+    width, height = planes.width, planes.height
+    # Y plane padded to an even number of rows, as in i420_planes (TurboJPEG expects the same)
+    y_size = planes.y_stride * ((height + 1) & ~1)
+    if (
+        isinstance(planes.y, np.ndarray)
+        and isinstance(planes.y.base, np.ndarray)
+        and planes.y_stride == _round_up_4(width)
+        and planes.uv_stride == _round_up_4((width + 1) // 2)
+        and planes.u.ctypes.data == planes.y.ctypes.data + y_size
+        and planes.v.ctypes.data == planes.u.ctypes.data + planes.u.size
+    ):
+        return planes.y.base[:y_size + 2 * planes.u.size], 4
+
+    chroma_height, chroma_width = (height + 1) // 2, (width + 1) // 2
+    y = np.frombuffer(planes.y, dtype=np.uint8)[:planes.y_stride * height].reshape(height, planes.y_stride)[:, :width]
+    if height & 1:
+        y = np.pad(y, ((0, 1), (0, 0)), mode="edge")
+    u = np.frombuffer(planes.u, dtype=np.uint8).reshape(-1, planes.uv_stride)[:chroma_height, :chroma_width]
+    v = np.frombuffer(planes.v, dtype=np.uint8).reshape(-1, planes.uv_stride)[:chroma_height, :chroma_width]
+    return np.concatenate((y.reshape(-1), u.reshape(-1), v.reshape(-1))), 1
+
+
+def i420_to_bgr(planes: YUV420Planes) -> np.ndarray:
+    """Convert I420 planes (see i420_planes) to a BGR24 frame, any width/height"""
+    width, height = planes.width, planes.height
+    chroma_height, chroma_width = (height + 1) // 2, (width + 1) // 2
+    y = planes.y[:planes.y_stride * height].reshape(height, planes.y_stride)[:, :width]
+    u = planes.u.reshape(-1, planes.uv_stride)[:chroma_height, :chroma_width]
+    v = planes.v.reshape(-1, planes.uv_stride)[:chroma_height, :chroma_width]
+    # cv2 only converts even sizes: repeat the last Y row/column (chroma already covers them)
+    # and crop the result back
+    if (width | height) & 1:
+        y = np.pad(y, ((0, height & 1), (0, width & 1)), mode="edge")
+    # cv2 expects I420 as one (H * 3/2, W) image: Y rows, then U and V packed two rows per line
+    i420 = np.concatenate((y.reshape(-1), u.reshape(-1), v.reshape(-1))).reshape(chroma_height * 3, chroma_width * 2)
+    return cv2.cvtColor(i420, cv2.COLOR_YUV2BGR_I420)[:height, :width]
+
+
+class RTSPBackend:
+    """Base class for RTSP capture backends"""
+
+    name = "base"
+    supports_yuv420 = False
+    supports_encoded = False
+
+    def __init__(self, rtsp_url: str):
+        self.rtsp_url = rtsp_url
+
+    def open(self) -> bool:
+        """Open the RTSP stream, returns True on success"""
+        raise NotImplementedError
+
+    def is_opened(self) -> bool:
+        """Check if the stream is open"""
+        raise NotImplementedError
+
+    def grab(self) -> bool:
+        """Advance to the next frame without converting it to BGR"""
+        raise NotImplementedError
+
+    def retrieve(self) -> Optional[np.ndarray]:
+        """Return the last grabbed frame as BGR24 ndarray, or None"""
+        raise NotImplementedError
+
+    def retrieve_yuv420(self) -> Optional[YUV420Planes]:
+        """Return the last grabbed frame as YUV420 planes without BGR conversion (if supported)"""
+        return None
+
+    def retrieve_encoded(self) -> Optional[memoryview]:
+        """Return the last grabbed frame as JPEG from a hardware encoder (if supported)"""
+        return None
+
+    def next_frame(self) -> Optional[np.ndarray]:
+        """Grab and retrieve the next frame"""
+        return self.retrieve() if self.grab() else None
+
+    def release(self) -> None:
+        """Close the stream"""
+        raise NotImplementedError
+
+
+class OpenCVBackend(RTSPBackend):
+    """cv2.VideoCapture (ffmpeg inside OpenCV, hardware decode via CAP_PROP_HW_ACCELERATION when available)"""
+
+    name = "opencv"
+
+    def __init__(self, rtsp_url: str, target_fps: Optional[int] = None, hwaccel: Optional[str] = DEFAULT_OPENCV_HWACCEL):
+        super().__init__(rtsp_url)
+        self.target_fps = target_fps
+        self.hwaccel = hwaccel
+        self.cap: Optional[cv2.VideoCapture] = None
+
+    def _hw_params(self) -> list:
+        """CAP_PROP_HW_ACCELERATION open params for self.hwaccel (any, vaapi, d3d11, mfx, drm), empty if unsupported"""
+        if not self.hwaccel or self.hwaccel == "none":
+            return []
+        acceleration = getattr(cv2, f"VIDEO_ACCELERATION_{self.hwaccel.upper()}", None)
+        if acceleration is None or not hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+            # OpenCV < 4.5.2, or an accelerator name this build doesn't know
+            logger.warning("OpenCV hardware decode '%s' not supported by this build, decoding in software", self.hwaccel)
+            return []
+        # No CAP_PROP_HW_DEVICE: OpenCV picks the device, and rejects an explicit one with ANY
+        return [cv2.CAP_PROP_HW_ACCELERATION, acceleration]
+
+    def open(self) -> bool:
+        # Read by OpenCV's FFmpeg backend when the capture is opened (an explicit env value wins)
+        os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", DEFAULT_FFMPEG_CAPTURE_OPTIONS)
+        hw_params = self._hw_params()
+        self.cap = cv2.VideoCapture(self.rtsp_url, cv2.CAP_FFMPEG, hw_params) if hw_params else None
+        if self.cap is None or not self.cap.isOpened():
+            if hw_params:
+                logger.warning("OpenCV hardware decode failed to open, retrying with software decode")
+            self.cap = cv2.VideoCapture(self.rtsp_url, cv2.CAP_FFMPEG)
+        elif self.cap.get(cv2.CAP_PROP_HW_ACCELERATION) > 0:
+            logger.info("OpenCV hardware decode active (VIDEO_ACCELERATION=%d)", int(self.cap.get(cv2.CAP_PROP_HW_ACCELERATION)))
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, DEFAULT_RTSP_BUFFER_SIZE)
+        if self.target_fps:
+            # Ask the source to regulate the rate (ignored by sources that cannot)
+            self.cap.set(cv2.CAP_PROP_FPS, self.target_fps)
+        return self.cap.isOpened()
+
+    def is_opened(self) -> bool:
+        return self.cap is not None and self.cap.isOpened()
+
+    def grab(self) -> bool:
+        return self.cap.grab()
+
+    def retrieve(self) -> Optional[np.ndarray]:
+        ret, frame = self.cap.retrieve()
+        return frame if ret else None
+
+    def release(self) -> None:
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+
+
+class OpenCVGstBackend(OpenCVBackend):
+    """
+    cv2.VideoCapture on a GStreamer pipeline with NVIDIA hardware decode (nvv4l2decoder + nvvidconv)
+
+    Decode and the NV12->BGRx conversion run on the GPU; only the final BGRx->BGR
+    repack is done by videoconvert. Requires an OpenCV build with GStreamer
+    support (the opencv-python wheels are built without it).
+    """
+
+    name = "opencv-gst"
+
+    def __init__(self, rtsp_url: str, decoder: str = DEFAULT_CUDA_GST_DECODER, target_fps: Optional[int] = None):
+        super().__init__(rtsp_url, target_fps=target_fps)
+        self.decoder = decoder
+
+    def build_pipeline_string(self) -> str:
+        """Build pipeline description (appsink keeps only the newest frame)"""
+        return (
+            f"rtspsrc location={self.rtsp_url} protocols=tcp latency=0 "
+            f"! rtph264depay ! h264parse ! {self.decoder} ! nvvidconv "
+            f"! video/x-raw,format=BGRx ! videoconvert ! video/x-raw,format=BGR "
+            f"! appsink max-buffers=1 drop=true sync=false"
+        )
+
+    def open(self) -> bool:
+        self.cap = cv2.VideoCapture(self.build_pipeline_string(), cv2.CAP_GSTREAMER)
+        if not self.cap.isOpened():
+            logger.error("GStreamer pipeline failed to open (requires OpenCV built with GStreamer and NVIDIA plugins)")
+            return False
+        return True
+
+
+class PyAVBackend(RTSPBackend):
+    """PyAV container decode with optional hardware acceleration (cuda, vaapi, videotoolbox)"""
+
+    name = "pyav"
+    supports_yuv420 = True
+
+    def __init__(self, rtsp_url: str, hwaccel: Optional[str] = DEFAULT_PYAV_HWACCEL):
+        super().__init__(rtsp_url)
+        self.hwaccel = hwaccel
+        self.container = None
+        self._frames = None
+        self._frame = None
+
+    def open(self) -> bool:
+        if av is None:
+            logger.error("PyAV backend requested but 'av' is not installed")
+            return False
+
+        options = dict(DEFAULT_PYAV_OPTIONS)
+        hwaccel = None
+        if self.hwaccel:
+            try:
+                from av.codec.hwaccel import HWAccel  # type: ignore
+                hwaccel = HWAccel(device_type=self.hwaccel, allow_software_fallback=True)
+            except ImportError:
+                logger.warning("PyAV build has no hwaccel support (requires av>=14), decoding in software")
+
+        try:
+            if hwaccel is not None:
+                self.container = av.open(self.rtsp_url, options=options, hwaccel=hwaccel)
+            else:
+                self.container = av.open(self.rtsp_url, options=options)
+        except av.error.FFmpegError as e:
+            if hwaccel is None:
+                raise
+            # Device creation failed (no GPU/driver) - retry with software decode
+            logger.warning("%s hwaccel unavailable (%s), decoding in software", self.hwaccel, e)
+            self.container = av.open(self.rtsp_url, options=options)
+
+        stream = self.container.streams.video[0]
+        stream.thread_type = "AUTO"
+        self._frames = self.container.decode(stream)
+        return True
+
+    def is_opened(self) -> bool:
+        return self.container is not None
+
+    def grab(self) -> bool:
+        # Frame stays in the decoder's native format (usually YUV420) until retrieve()
+        try:
+            self._frame = next(self._frames)
+            return True
+        except StopIteration:
+            logger.warning("PyAV stream ended")
+        except av.error.FFmpegError as e:
+            logger.warning("PyAV decode error: %s", e)
+        self.release()
+        return False
+
+    def retrieve(self) -> Optional[np.ndarray]:
+        if self._frame is None:
+            return None
+        return self._frame.to_ndarray(format="bgr24")
+
+    def retrieve_yuv420(self) -> Optional[YUV420Planes]:
+        if self._frame is None:
+            return None
+
+        # H.264 decodes to YUV420 already; only hwaccel output (e.g. NV12) needs reformat
+        frame = self._frame
+        if frame.format.name not in ("yuv420p", "yuvj420p"):
+            frame = frame.reformat(format="yuv420p")
+        y, u, v = frame.planes
+        return YUV420Planes(frame.width, frame.height, y, u, v, y.line_size, u.line_size)
+
+    def release(self) -> None:
+        if self.container:
+            self.container.close()
+        self.container = None
+        self._frames = None
+        self._frame = None
+
+
+class GstBackend(RTSPBackend):
+    """
+    GStreamer pipeline with a hardware decoder element (e.g. vaapih264dec, nvv4l2decoder)
+
+    The appsink receives planar I420 instead of BGR: hardware decoders output NV12, and
+    NV12 -> I420 is only a chroma plane shuffle in videoconvert (no per-pixel color math).
+    retrieve_yuv420() hands the planes to the WebP encoder as-is; retrieve() converts
+    to BGR with cv2.cvtColor only for frames that go through the BGR path.
+    """
+
+    name = "gstreamer"
+    supports_yuv420 = True
+
+    def __init__(self, rtsp_url: str, decoder: str = DEFAULT_GST_DECODER):
+        super().__init__(rtsp_url)
+        self.decoder = decoder
+        self.pipeline = None
+        self.appsink = None
+        self._sample = None
+
+    def build_pipeline_string(self) -> str:
+        """Build pipeline description (appsink keeps only the newest frame)"""
+        return (
+            f"rtspsrc location={self.rtsp_url} protocols=tcp latency=0 "
+            f"! rtph264depay ! h264parse ! {self.decoder} ! videoconvert "
+            f"! video/x-raw,format=I420 "
+            f"! appsink name=sink emit-signals=true max-buffers=1 drop=true sync=false"
+        )
+
+    def open(self) -> bool:
+        if Gst is None:
+            logger.error("GStreamer backend requested but PyGObject/Gst is not installed")
+            return False
+
+        Gst.init(None)
+        self.pipeline = Gst.parse_launch(self.build_pipeline_string())
+        self.appsink = self.pipeline.get_by_name("sink")
+        if self.pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+            self.release()
+            return False
+        return True
+
+    def is_opened(self) -> bool:
+        return self.pipeline is not None
+
+    def grab(self) -> bool:
+        self._sample = self.appsink.emit("try-pull-sample", DEFAULT_GST_PULL_TIMEOUT_NS)
+        if self._sample is None and self.appsink.get_property("eos"):
+            logger.warning("GStreamer pipeline reached end of stream")
+            self.release()
+        return self._sample is not None
+
+    def _read_sample(self, convert):
+        """Map the grabbed sample and run convert(data, width, height) while the GstBuffer is mapped"""
+        if self._sample is None:
+            return None
+
+        caps = self._sample.get_caps().get_structure(0)
+        width, height = caps.get_value("width"), caps.get_value("height")
+        buffer = self._sample.get_buffer()
+        ok, map_info = buffer.map(Gst.MapFlags.READ)
+        if not ok:
+            return None
+        try:
+            return convert(np.frombuffer(map_info.data, dtype=np.uint8), width, height)
+        finally:
+            buffer.unmap(map_info)
+
+    @staticmethod
+    def _convert_bgr(data: np.ndarray, width: int, height: int) -> np.ndarray:
+        if width % 8 == 0 and height % 2 == 0:
+            # No row padding: convert straight from the mapped buffer
+            return cv2.cvtColor(data[:width * height * 3 // 2].reshape(height * 3 // 2, width), cv2.COLOR_YUV2BGR_I420)
+        return i420_to_bgr(i420_planes(data, width, height))
+
+    @staticmethod
+    def _convert_yuv420(data: np.ndarray, width: int, height: int) -> YUV420Planes:
+        # Copy out of the mapped GstBuffer before it is returned to the pool
+        return i420_planes(data.copy(), width, height)
+
+    def retrieve(self) -> Optional[np.ndarray]:
+        return self._read_sample(self._convert_bgr)
+
+    def retrieve_yuv420(self) -> Optional[YUV420Planes]:
+        return self._read_sample(self._convert_yuv420)
+
+    def release(self) -> None:
+        if self.pipeline:
+            self.pipeline.set_state(Gst.State.NULL)
+        self.pipeline = None
+        self.appsink = None
+        self._sample = None
+
+
+class GstJpegBackend(GstBackend):
+    """
+    GStreamer pipeline that decodes and JPEG-encodes on the GPU / iGPU (nvjpegenc or vaapijpegenc)
+
+    The appsink receives finished JPEG bytes, so the CPU neither decodes nor encodes;
+    retrieve_encoded() returns them as-is. retrieve() decodes the JPEG to BGR only
+    for frames that need drawing (boxes/preprocessing are re-encoded in software).
+    """
+
+    name = "gstreamer-jpeg"
+    supports_yuv420 = False
+    supports_encoded = True
+
+    def __init__(self, rtsp_url: str, encoder: str = DEFAULT_GST_JPEG_ENCODER, quality: int = DEFAULT_GST_JPEG_QUALITY):
+        super().__init__(rtsp_url)
+        self.encoder = encoder
+        self.quality = quality
+
+    def build_pipeline_string(self) -> str:
+        """Build pipeline description (appsink keeps only the newest frame)"""
+        decode_chain = GST_JPEG_DECODE_CHAINS.get(self.encoder, f"{DEFAULT_GST_DECODER} ! videoconvert")
+        return (
+            f"rtspsrc location={self.rtsp_url} protocols=tcp latency=0 "
+            f"! rtph264depay ! h264parse ! {decode_chain} ! {self.encoder} quality={self.quality} "
+            f"! image/jpeg "
+            f"! appsink name=sink emit-signals=true max-buffers=1 drop=true sync=false"
+        )
+
+    @staticmethod
+    def _convert_encoded(data: np.ndarray, width: int, height: int) -> memoryview:
+        # Copy out of the mapped GstBuffer before it is returned to the pool
+        return memoryview(data.copy()).cast("B")
+
+    @staticmethod
+    def _convert_bgr(data: np.ndarray, width: int, height: int) -> Optional[np.ndarray]:
+        return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+    def retrieve_encoded(self) -> Optional[memoryview]:
+        return self._read_sample(self._convert_encoded)
+
+    def retrieve_yuv420(self) -> Optional[YUV420Planes]:
+        return None
+
+
+def create_backend(name: str, rtsp_url: str, hwaccel: Optional[str] = None,
+                   target_fps: Optional[int] = None) -> RTSPBackend:
+    """
+    Create RTSP backend by name
+
+    Args:
+        name: "opencv", "opencv-gst", "pyav", "gstreamer" or "gstreamer-jpeg"
+        rtsp_url: RTSP stream URL
+        hwaccel: OpenCV VIDEO_ACCELERATION name, PyAV hwaccel device type, GStreamer decoder element name,
+            or GStreamer JPEG encoder element name (gstreamer-jpeg)
+        target_fps: Output frame rate requested from the source (OpenCV backend)
+
+    Returns:
+        RTSPBackend: Unopened backend instance
+
+    Raises:
+        ValueError: If backend name is unknown
+    """
+    if name == OpenCVBackend.name:
+        return OpenCVBackend(rtsp_url, target_fps=target_fps, hwaccel=hwaccel or DEFAULT_OPENCV_HWACCEL)
+    if name == OpenCVGstBackend.name:
+        return OpenCVGstBackend(rtsp_url, decoder=hwaccel or DEFAULT_CUDA_GST_DECODER, target_fps=target_fps)
+    if name == PyAVBackend.name:
+        return PyAVBackend(rtsp_url, hwaccel=hwaccel or DEFAULT_PYAV_HWACCEL)
+    if name == GstBackend.name:
+        return GstBackend(rtsp_url, decoder=hwaccel or DEFAULT_GST_DECODER)
+    if name == GstJpegBackend.name:
+        return GstJpegBackend(rtsp_url, encoder=hwaccel or DEFAULT_GST_JPEG_ENCODER)
+    raise ValueError(f"Unknown RTSP backend: {name}")
@@ -6,9 +6,15 @@ Tests basic functionality without requiring actual RTSP stream
 
 import sys
 import os
+import asyncio
+import time
 import numpy as np
 import cv2
-from main import RTSPProducer
+from main import STREAM_LENGTH_PREFIX, RTSPProducer
+from adaptive_quality import (DEFAULT_MIN_QUALITY, DEFAULT_OVERLOAD_FRAMES, DEFAULT_QUALITY_STEP,
+                              DEFAULT_RECOVER_FRAMES, AdaptiveQuality, FrameLatency)
+from rtsp_backend import GstBackend, i420_planes, i420_unified
+from kernels import HAVE_NUMBA, build_preprocess_lut, draw_rectangles, letterbox, letterbox_geometry, preprocess
 
 def test_producer_initialization():
     """Test that producer can be initialized"""
@@ -37,26 +43,198 @@ def test_http_client_initialization(producer):
     print("✓ HTTP/2 client initialization: PASSED")
     return producer
 
-def test_frame_processing(producer):
-    """Test frame processing (WebP encoding)"""
-    print("Testing frame processing...")
+def test_frame_processing(producer, magic=b'RIFF'):
+    """Test frame processing (WebP by default, or JPEG with ENCODE_FORMAT=jpeg)"""
+    print(f"Testing frame processing ({producer.encode_format})...")
     
-    # Create a dummy frame (640x480 RGB)
-    dummy_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-    dummy_frame[:, :] = [128, 128, 128]  # Gray frame
+    # Create a dummy frame (640x480 BGR, gray)
+    dummy_frame = np.full((480, 640, 3), 128, dtype=np.uint8)
     
     # Process frame
     frame_data = producer.process_frame(dummy_frame)
     
     assert frame_data is not None
-    assert isinstance(frame_data, bytes)
+    assert isinstance(frame_data, (bytes, memoryview))
     assert len(frame_data) > 0
     
-    # Verify it's valid WebP (starts with RIFF)
-    assert frame_data[:4] == b'RIFF'
-    print("✓ Frame processing: PASSED")
+    # Verify the magic bytes (WebP: RIFF, JPEG: SOI marker)
+    assert frame_data[:len(magic)] == magic
+    print(f"✓ Frame processing ({producer.encode_format}): PASSED")
     return True
 
+def parse_batch(body):
+    """Split a batch ingest body back into frames ([u32 BE length][frame] repeated)"""
+    frames = []
+    offset = 0
+    while offset < len(body):
+        (length,) = STREAM_LENGTH_PREFIX.unpack_from(body, offset)
+        offset += STREAM_LENGTH_PREFIX.size
+        frames.append(body[offset:offset + length])
+        offset += length
+    assert offset == len(body), "truncated frame at the end of the batch"
+    return frames
+
+class FakeBatchClient:
+    """Records batch POSTs instead of sending them"""
+    
+    def __init__(self):
+        self.requests = []
+    
+    async def post(self, url, content, headers):
+        self.requests.append((url, content, headers))
+        return type("Response", (), {"status_code": 200})()
+    
+    async def aclose(self):
+        pass
+
+def test_batch_ingest():
+    """Test batch ingest framing: full batch of K, then a partial batch flushed on timeout"""
+    print("Testing batch ingest...")
+    producer = RTSPProducer(
+        rtsp_url="rtsp://test:554/stream",
+        broker_url="http://localhost:3090",
+        stream_id="test_stream",
+        ingest_batch=3,
+        ingest_batch_timeout_ms=200
+    )
+    client = FakeBatchClient()
+    producer.client = client
+    frames = [bytes([i]) * (10 + i) for i in range(5)]
+    
+    async def run():
+        loop = asyncio.get_running_loop()
+        sender = asyncio.create_task(producer._send_loop_async())
+        for frame in frames:
+            # enc_q holds one item: put() waits until the send loop took the previous frame
+            await loop.run_in_executor(None, producer._enc_q.put, memoryview(frame))
+        # The last 2 frames never fill a batch and must go out after the 200 ms timeout
+        deadline = time.monotonic() + 2.0
+        while len(client.requests) < 2 and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        producer._stop_event.set()
+        await sender
+    
+    asyncio.run(run())
+    
+    assert len(client.requests) == 2, f"expected 2 batches, got {len(client.requests)}"
+    for (url, body, headers), expected in zip(client.requests, (frames[:3], frames[3:])):
+        assert url == "http://localhost:3090/ingest/test_stream"
+        assert headers["Content-Type"] == "application/octet-stream"
+        assert headers["X-Frame-Count"] == str(len(expected))
+        assert parse_batch(body) == expected
+    assert producer.frames_sent == len(frames)
+    print("✓ Batch ingest: PASSED")
+
+def i420_buffer(i420, width, height):
+    """Lay out the top-left width x height of an even-sized cv2 I420 image like GStreamer does"""
+    full_height, full_width = i420.shape[0] * 2 // 3, i420.shape[1]
+    y_plane = i420[:full_height]
+    chroma = i420[full_height:].reshape(2, full_height // 2, full_width // 2)
+    y_stride, uv_stride = (width + 3) & ~3, ((width + 1) // 2 + 3) & ~3
+    chroma_height, chroma_width = (height + 1) // 2, (width + 1) // 2
+    y = np.zeros(((height + 1) & ~1, y_stride), dtype=np.uint8)
+    y[:height, :width] = y_plane[:height, :width]
+    uv = np.zeros((2, chroma_height, uv_stride), dtype=np.uint8)
+    uv[:, :, :chroma_width] = chroma[:, :chroma_height, :chroma_width]
+    return np.concatenate((y.reshape(-1), uv.reshape(-1)))
+
+def test_i420_odd_sizes():
+    """Test I420 -> BGR conversion and the unified TurboJPEG buffer for odd frame sizes"""
+    print("Testing I420 conversion (odd sizes)...")
+    bgr = (np.arange(482 * 642 * 3, dtype=np.uint32) % 253).astype(np.uint8).reshape(482, 642, 3)
+    i420 = cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420)
+    reference = cv2.cvtColor(i420, cv2.COLOR_YUV2BGR_I420)
+    for width, height in ((640, 480), (640, 481), (641, 480), (641, 481)):
+        data = i420_buffer(i420, width, height)
+        converted = GstBackend._convert_bgr(data, width, height)
+        assert converted.shape == (height, width, 3), f"{width}x{height}: shape {converted.shape}"
+        assert np.array_equal(converted, reference[:height, :width]), f"{width}x{height}: pixels differ"
+        # Zero-copy unified buffer covers the whole frame, Y padded to an even row count
+        unified, align = i420_unified(i420_planes(data, width, height))
+        assert align == 4 and len(unified) == len(data)
+    print("✓ I420 conversion (odd sizes): PASSED")
+
+def test_kernels():
+    """Test the kernels against their OpenCV reference on a fixed frame"""
+    print(f"Testing kernels ({'numba' if HAVE_NUMBA else 'OpenCV'})...")
+    frame = (np.arange(48 * 64 * 3, dtype=np.uint32) % 251).astype(np.uint8).reshape(48, 64, 3)
+    
+    lut = build_preprocess_lut(gain=1.3, bias=-10.0, gamma=0.8)
+    out = np.empty_like(frame)
+    assert preprocess(frame, out, lut) is out
+    assert np.array_equal(out, cv2.LUT(frame, lut))
+    
+    # Overlapping and partly off-frame boxes: later boxes overwrite earlier ones
+    rects = np.array([[5, 5, 40, 30], [20, 10, 70, 45], [-3, 40, 10, 52]], dtype=np.int32)
+    colors = np.array([[255, 0, 0], [0, 255, 0], [0, 0, 255]], dtype=np.uint8)
+    for thickness in (1, 3):
+        thicknesses = np.full(len(rects), thickness, dtype=np.int32)
+        drawn = frame.copy()
+        draw_rectangles(drawn, rects, colors, thicknesses)
+        expected = frame.copy()
+        for (x1, y1, x2, y2), color in zip(rects.tolist(), colors.tolist()):
+            cv2.rectangle(expected, (x1, y1), (x2, y2), color, thickness)
+        if thickness > 1:
+            # cv2 rounds the outer corners of thick lines, the numba kernel keeps them square
+            half = (thickness + 1) // 2
+            for x1, y1, x2, y2 in rects.tolist():
+                for x, y in ((x1, y1), (x2, y1), (x1, y2), (x2, y2)):
+                    corner = (slice(max(y - half, 0), max(y + half + 1, 0)), slice(max(x - half, 0), max(x + half + 1, 0)))
+                    drawn[corner] = expected[corner] = 0
+        assert np.array_equal(drawn, expected), f"draw_rectangles differs from cv2.rectangle (thickness {thickness})"
+    print("✓ Kernels: PASSED")
+
+def test_letterbox():
+    """Test letterbox offsets and padding for a source taller than the output"""
+    print("Testing letterbox...")
+    src = np.full((200, 100, 3), 200, dtype=np.uint8)
+    dst = np.full((100, 100, 3), 7, dtype=np.uint8)
+    
+    assert letterbox_geometry(src.shape, dst.shape) == (25, 0, 50, 100)
+    assert letterbox_geometry((100, 200), (100, 100)) == (0, 25, 100, 50)
+    
+    assert letterbox(src, dst) is dst
+    assert (dst[:, :25] == 0).all() and (dst[:, 75:] == 0).all()
+    assert (dst[:, 25:75] == 200).all()
+    
+    letterbox(src, dst, pad=114)
+    assert (dst[:, :25] == 114).all() and (dst[:, 75:] == 114).all()
+    print("✓ Letterbox: PASSED")
+
+def test_adaptive_quality():
+    """Test AdaptiveQuality step-down under sustained load and step-up once it recovers"""
+    print("Testing adaptive quality...")
+    latency = FrameLatency()
+    controller = AdaptiveQuality(latency, frame_interval=0.1, max_quality=60)
+    
+    def run(total_ms, frames):
+        changes = 0
+        for _ in range(frames):
+            # Averages settled on total_ms (encode + send)
+            latency.encode_ms, latency.send_ms = total_ms * 0.75, total_ms * 0.25
+            changes += controller.update()
+        return changes
+    
+    # Over budget: one step per DEFAULT_OVERLOAD_FRAMES frames, the step lands on the last one
+    assert run(95.0, DEFAULT_OVERLOAD_FRAMES - 1) == 0 and controller.quality == 60
+    assert run(95.0, 1) == 1 and controller.quality == 60 - DEFAULT_QUALITY_STEP
+    steps = (60 - DEFAULT_MIN_QUALITY) // DEFAULT_QUALITY_STEP
+    assert run(95.0, (steps - 1) * DEFAULT_OVERLOAD_FRAMES) == steps - 1
+    assert controller.quality == DEFAULT_MIN_QUALITY and not controller.downscale
+    # Below min quality there is nothing left but downscaling
+    assert run(95.0, DEFAULT_OVERLOAD_FRAMES) == 1 and controller.downscale
+    assert run(95.0, 2 * DEFAULT_OVERLOAD_FRAMES) == 0
+    
+    # Between 50% and 90% the controller holds
+    assert run(70.0, 2 * DEFAULT_RECOVER_FRAMES) == 0
+    
+    # Room to spare: undo downscaling first, then quality back up to max_quality
+    assert run(40.0, DEFAULT_RECOVER_FRAMES - 1) == 0 and controller.downscale
+    assert run(40.0, 1) == 1 and not controller.downscale
+    assert run(40.0, (steps + 2) * DEFAULT_RECOVER_FRAMES) == steps
+    assert controller.quality == 60
+    print("✓ Adaptive quality: PASSED")
+
 def test_cleanup(producer):
     """Test cleanup"""
     print("Testing cleanup...")
@@ -83,8 +261,29 @@ def main():
         # Test 3: Frame Processing
         test_frame_processing(producer)
         print()
+        jpeg_producer = RTSPProducer(
+            rtsp_url="rtsp://test:554/stream",
+            broker_url="http://localhost:3090",
+            encode_format="jpeg"
+        )
+        test_frame_processing(jpeg_producer, magic=b'\xff\xd8\xff')
+        print()
+        
+        # Test 4: Batch ingest
+        test_batch_ingest()
+        print()
+        
+        # Test 5: Kernels, letterbox and adaptive quality
+        test_i420_odd_sizes()
+        print()
+        test_kernels()
+        print()
+        test_letterbox()
+        print()
+        test_adaptive_quality()
+        print()
         
-        # Test 4: Cleanup
+        # Test 6: Cleanup
         test_cleanup(producer)
         print()
         
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Direct libwebp encoder binding (cffi ABI mode)
+Bypasses cv2.imencode so frames are encoded by the system (or custom AVX2) libwebp
+"""
+
+import ctypes.util
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+
+# Try to import cffi, fallback to cv2.imencode in the producer if not available
+try:
+    from cffi import FFI  # type: ignore
+except ImportError:
+    FFI = None
+
+logger = logging.getLogger(__name__)
+
+# Subset of webp/encode.h used by the producer (struct layouts match libwebp >= 1.1)
+WEBP_CDEF = """
+typedef enum { WEBP_PRESET_DEFAULT = 0 } WebPPreset;
+typedef enum {
+    WEBP_HINT_DEFAULT = 0, WEBP_HINT_PICTURE, WEBP_HINT_PHOTO, WEBP_HINT_GRAPH
+} WebPImageHint;
+typedef enum { WEBP_YUV420 = 0, WEBP_YUV420A = 4 } WebPEncCSP;
+
+typedef struct WebPConfig {
+    int lossless;
+    float quality;
+    int method;
+    WebPImageHint image_hint;
+    int target_size;
+    float target_PSNR;
+    int segments;
+    int sns_strength;
+    int filter_strength;
+    int filter_sharpness;
+    int filter_type;
+    int autofilter;
+    int alpha_compression;
+    int alpha_filtering;
+    int alpha_quality;
+    int pass;
+    int show_compressed;
+    int preprocessing;
+    int partitions;
+    int partition_limit;
+    int emulate_jpeg_size;
+    int thread_level;
+    int low_memory;
+    int near_lossless;
+    int exact;
+    int use_delta_palette;
+    int use_sharp_yuv;
+    int qmin;
+    int qmax;
+} WebPConfig;
+
+typedef struct WebPAuxStats WebPAuxStats;
+typedef struct WebPPicture WebPPicture;
+typedef int (*WebPWriterFunction)(const uint8_t* data, size_t data_size, const WebPPicture* picture);
+typedef int (*WebPProgressHook)(int percent, const WebPPicture* picture);
+
+struct WebPPicture {
+    int use_argb;
+    WebPEncCSP colorspace;
+    int width, height;
+    uint8_t* y;
+    uint8_t* u;
+    uint8_t* v;
+    int y_stride, uv_stride;
+    uint8_t* a;
+    int a_stride;
+    uint32_t pad1[2];
+    uint32_t* argb;
+    int argb_stride;
+    uint32_t pad2[3];
+    WebPWriterFunction writer;
+    void* custom_ptr;
+    int extra_info_type;
+    uint8_t* extra_info;
+    WebPAuxStats* stats;
+    int error_code;
+    WebPProgressHook progress_hook;
+    void* user_data;
+    uint32_t pad3[3];
+    uint8_t* pad4;
+    uint8_t* pad5;
+    uint32_t pad6[8];
+    void* memory_;
+    void* memory_argb_;
+    void* pad7[2];
+};
+
+typedef struct WebPMemoryWriter {
+    uint8_t* mem;
+    size_t size;
+    size_t max_size;
+    uint32_t pad[1];
+} WebPMemoryWriter;
+
+int WebPGetEncoderVersion(void);
+void WebPFree(void* ptr);
+void* WebPMalloc(size_t size);
+
+int WebPConfigInitInternal(WebPConfig* config, WebPPreset preset, float quality, int version);
+int WebPValidateConfig(const WebPConfig* config);
+int WebPPictureInitInternal(WebPPicture* picture, int version);
+int WebPPictureImportBGR(WebPPicture* picture, const uint8_t* bgr, int bgr_stride);
+void WebPPictureFree(WebPPicture* picture);
+void WebPMemoryWriterInit(WebPMemoryWriter* writer);
+void WebPMemoryWriterClear(WebPMemoryWriter* writer);
+int WebPMemoryWrite(const uint8_t* data, size_t data_size, const WebPPicture* picture);
+int WebPEncode(const WebPConfig* config, WebPPicture* picture);
+"""
+
+# WEBP_ENCODER_ABI_VERSION from encode.h (only the major byte is checked by libwebp)
+WEBP_ENCODER_ABI_VERSION = 0x020f
+
+# Initial output buffer size; grows to the largest encoded frame seen
+DEFAULT_OUTPUT_CAPACITY = 64 * 1024
+
+
+def _load_libwebp():
+    """
+    Load libwebp shared library
+
+    Search order: LIBWEBP_PATH (e.g. an AVX2 build from build-libwebp.sh),
+    then the system library.
+
+    Returns:
+        Tuple of (ffi, lib), or (None, None) if cffi/libwebp is not available
+    """
+    if FFI is None:
+        return None, None
+
+    ffi = FFI()
+    ffi.cdef(WEBP_CDEF)
+
+    candidates = [os.getenv("LIBWEBP_PATH"), ctypes.util.find_library("webp"), "libwebp.so"]
+    for candidate in candidates:
+        if not candidate:
+            continue
+        try:
+            return ffi, ffi.dlopen(candidate)
+        except OSError:
+            continue
+    return None, None
+
+
+ffi, lib = _load_libwebp()
+HAVE_LIBWEBP = lib is not None
+
+
+def libwebp_version() -> Optional[str]:
+    """Return loaded libwebp version as "major.minor.revision", or None if not loaded"""
+    if not HAVE_LIBWEBP:
+        return None
+    version = lib.WebPGetEncoderVersion()
+    return f"{(version >> 16) & 0xff}.{(version >> 8) & 0xff}.{version & 0xff}"
+
+
+class WebPEncoder:
+    """
+    Reusable encoder on libwebp's advanced API
+
+    WebPConfig, WebPPicture and the output writer are initialized once and reused
+    for every frame; only the picture dimensions and pixel pointer change per frame.
+    """
+
+    def __init__(self, quality: float = 60.0, method: int = 1):
+        """
+        Args:
+            quality: WebP quality factor (0-100)
+            method: Speed/size trade-off (0=fastest, 6=slowest). Low values suit live streaming.
+
+        Raises:
+            RuntimeError: If libwebp is not available or rejects the configuration
+        """
+        if not HAVE_LIBWEBP:
+            raise RuntimeError("libwebp is not available")
+
+        self._config = ffi.new("WebPConfig*")
+        if not lib.WebPConfigInitInternal(self._config, lib.WEBP_PRESET_DEFAULT, quality, WEBP_ENCODER_ABI_VERSION):
+            raise RuntimeError("WebPConfigInit failed (libwebp version mismatch)")
+        self._config.method = method
+        self._config.thread_level = 1  # Use libwebp's worker thread for filtering/analysis
+        self._config.near_lossless = 100  # Near-lossless preprocessing off
+        self._config.lossless = 0
+        self._config.image_hint = lib.WEBP_HINT_PICTURE  # Camera frames (tunes segment/filter analysis)
+        self._config.alpha_compression = 0  # BGR frames carry no alpha plane
+        self._config.use_sharp_yuv = 0  # Sharp RGB->YUV is several times slower than the fast conversion
+        if not lib.WebPValidateConfig(self._config):
+            raise RuntimeError("Invalid WebP encoder configuration")
+
+        self._picture = ffi.new("WebPPicture*")
+        if not lib.WebPPictureInitInternal(self._picture, WEBP_ENCODER_ABI_VERSION):
+            raise RuntimeError("WebPPictureInit failed (libwebp version mismatch)")
+
+        self._writer = ffi.new("WebPMemoryWriter*")
+        self._picture.writer = lib.WebPMemoryWrite
+        self._picture.custom_ptr = self._writer
+        self._capacity = DEFAULT_OUTPUT_CAPACITY  # Steady-state output size (max seen so far)
+
+    @property
+    def quality(self) -> float:
+        """WebP quality factor (0-100) used for the next frame"""
+        return self._config.quality
+
+    @quality.setter
+    def quality(self, quality: float) -> None:
+        self._config.quality = quality
+
+    def encode_bgr(self, frame: np.ndarray) -> Optional[memoryview]:
+        """
+        Encode a BGR24 frame (HxWx3 uint8, rows contiguous) to WebP
+
+        Returns:
+            memoryview: Encoded WebP data, or None if encoding failed
+        """
+        picture = self._picture
+        picture.use_argb = 0  # Import straight to YUV420 (lossy), no intermediate ARGB buffer
+        picture.width = frame.shape[1]
+        picture.height = frame.shape[0]
+        if not lib.WebPPictureImportBGR(picture, ffi.from_buffer(frame), frame.strides[0]):
+            return None
+        return self._encode()
+
+    def encode_yuv420(self, width: int, height: int, y, u, v, y_stride: int, uv_stride: int) -> Optional[memoryview]:
+        """
+        Encode planar YUV420 directly, without the BGR->YUV conversion done by encode_bgr()
+
+        Args:
+            width, height: Frame dimensions
+            y, u, v: Plane buffers (e.g. decoder output planes), referenced without copying
+            y_stride, uv_stride: Bytes per row of the Y plane and of the U/V planes
+
+        Returns:
+            memoryview: Encoded WebP data, or None if encoding failed
+        """
+        # Keep plane cdata alive until WebPEncode returns
+        y_ptr, u_ptr, v_ptr = ffi.from_buffer(y), ffi.from_buffer(u), ffi.from_buffer(v)
+
+        picture = self._picture
+        picture.use_argb = 0
+        picture.colorspace = lib.WEBP_YUV420
+        picture.width = width
+        picture.height = height
+        picture.y, picture.u, picture.v = y_ptr, u_ptr, v_ptr
+        picture.y_stride = y_stride
+        picture.uv_stride = uv_stride
+        picture.a = ffi.NULL
+        return self._encode()
+
+    def _encode(self) -> Optional[memoryview]:
+        """
+        Run WebPEncode on the prepared picture and return the output without copying
+
+        The output buffer is presized to the largest frame seen so far, so
+        WebPMemoryWrite never has to grow it (each growth is malloc + memcpy of
+        everything written so far + free). Ownership of the buffer moves to the
+        returned memoryview: it is released with WebPFree once the last reference
+        is dropped, so the payload can stay queued/in flight while the next frame
+        is encoded.
+        """
+        writer = self._writer
+        lib.WebPMemoryWriterInit(writer)
+        mem = lib.WebPMalloc(self._capacity)
+        if mem != ffi.NULL:
+            writer.mem = ffi.cast("uint8_t*", mem)
+            writer.max_size = self._capacity
+        if not lib.WebPEncode(self._config, self._picture):
+            logger.debug("WebPEncode failed with error code %d", self._picture.error_code)
+            lib.WebPMemoryWriterClear(writer)
+            return None
+        self._capacity = max(self._capacity, writer.max_size)
+        mem = ffi.gc(writer.mem, lib.WebPFree)
+        return memoryview(ffi.buffer(mem, writer.size))
+
+    def close(self) -> None:
+        """Release picture buffers allocated by libwebp"""
+        lib.WebPPictureFree(self._picture)
@@ -1,50 +1,142 @@
 #!/usr/bin/env python3
 """
 Simple HTTP server for web-client
-Serves static files on port 3092
+Serves static files on port 3092 (aiohttp if installed, http.server otherwise)
 """
 
 import http.server
+import socket
 import socketserver
 import os
 import sys
+import threading
+from collections import OrderedDict
 from pathlib import Path
 
+# Try to import aiohttp (async server, sendfile + keep-alive), fallback to http.server
+try:
+    from aiohttp import web  # type: ignore
+except ImportError:
+    web = None
+
 # Get the directory where this script is located
 SCRIPT_DIR = Path(__file__).parent.absolute()
 PORT = 3092
+CACHE_MAX_FILE_SIZE = 256 * 1024  # http.server fallback: smaller files are served from memory
+CACHE_MAX_FILES = 64  # LRU size of the in-memory file cache
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type',
+}
+
+# (path, mtime_ns, size) -> file content; a changed file gets a new key
+_file_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+_file_cache_lock = threading.Lock()
 
 class CustomHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
-    """Custom request handler with CORS support"""
+    """Custom request handler with CORS support, small-file cache and sendfile for larger files"""
+    
+    # Keep-alive: the browser loads index.html, the script and the favicon over one connection
+    protocol_version = "HTTP/1.1"
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=str(SCRIPT_DIR), **kwargs)
     
     def end_headers(self):
         # Add CORS headers
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        for name, value in CORS_HEADERS.items():
+            self.send_header(name, value)
         super().end_headers()
     
+    def copyfile(self, source, outputfile):
+        """Write the file body: cached bytes below CACHE_MAX_FILE_SIZE, sendfile(2) above"""
+        try:
+            stat = os.fstat(source.fileno())
+        except (AttributeError, OSError):
+            # Directory listing (BytesIO)
+            return super().copyfile(source, outputfile)
+        
+        if stat.st_size >= CACHE_MAX_FILE_SIZE:
+            # Kernel copies file pages straight to the socket (headers are already flushed)
+            self.connection.sendfile(source)
+            return
+        
+        key = (source.name, stat.st_mtime_ns, stat.st_size)
+        with _file_cache_lock:
+            data = _file_cache.get(key)
+            if data is not None:
+                _file_cache.move_to_end(key)
+        if data is None:
+            data = source.read()
+            with _file_cache_lock:
+                _file_cache[key] = data
+                if len(_file_cache) > CACHE_MAX_FILES:
+                    _file_cache.popitem(last=False)
+        outputfile.write(data)
+    
     def log_message(self, format, *args):
         """Custom log format"""
         sys.stderr.write(f"[{self.log_date_time_string()}] {format % args}\n")
 
+class WebClientServer(socketserver.ThreadingTCPServer):
+    """One thread per connection; SO_REUSEPORT lets several server processes share the port"""
+    
+    allow_reuse_address = True
+    daemon_threads = True
+    
+    def server_bind(self):
+        if hasattr(socket, "SO_REUSEPORT"):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+def create_app():
+    """
+    aiohttp application: static files from SCRIPT_DIR (FileResponse uses sendfile(2)),
+    index.html for /, the same CORS headers as CustomHTTPRequestHandler
+    """
+    @web.middleware
+    async def cors_middleware(request, handler):
+        if request.method == 'OPTIONS':
+            response = web.Response()
+        else:
+            response = await handler(request)
+        response.headers.update(CORS_HEADERS)
+        return response
+
+    async def index(request):
+        return web.FileResponse(SCRIPT_DIR / 'index.html')
+
+    app = web.Application(middlewares=[cors_middleware])
+    app.router.add_get('/', index)
+    app.router.add_static('/', SCRIPT_DIR)
+    return app
+
+def print_banner(server_name):
+    print("=" * 60)
+    print(f"Web Client Server ({server_name})")
+    print("=" * 60)
+    print(f"Server running on http://0.0.0.0:{PORT}")
+    print(f"Server running on http://localhost:{PORT}")
+    print(f"Serving directory: {SCRIPT_DIR}")
+    print("=" * 60)
+    print("Press Ctrl+C to stop the server")
+    print("=" * 60)
+
 def main():
     """Start the HTTP server"""
     os.chdir(SCRIPT_DIR)
     
-    with socketserver.TCPServer(("", PORT), CustomHTTPRequestHandler) as httpd:
-        print("=" * 60)
-        print("Web Client Server")
-        print("=" * 60)
-        print(f"Server running on http://0.0.0.0:{PORT}")
-        print(f"Server running on http://localhost:{PORT}")
-        print(f"Serving directory: {SCRIPT_DIR}")
-        print("=" * 60)
-        print("Press Ctrl+C to stop the server")
-        print("=" * 60)
+    if web is not None:
+        print_banner("aiohttp")
+        # run_app handles Ctrl+C and shuts down cleanly
+        web.run_app(create_app(), port=PORT, print=None)
+        print("\n\nServer stopped.")
+        return
+
+    with WebClientServer(("", PORT), CustomHTTPRequestHandler) as httpd:
+        print_banner("http.server, pip install aiohttp for the async server")
         
         try:
             httpd.serve_forever()
@@ -54,4 +146,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
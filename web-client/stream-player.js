@@ -4,6 +4,15 @@
  * Following PIPELINE_KNOWLEDGE.md specifications
  */
 
+/**
+ * Detect image MIME type from magic bytes (producer sends WebP or JPEG, see ENCODE_FORMAT)
+ * JPEG starts with FF D8, WebP with "RIFF"
+ */
+function detectImageType(arrayBuffer) {
+    const header = new Uint8Array(arrayBuffer, 0, Math.min(2, arrayBuffer.byteLength));
+    return header[0] === 0xFF && header[1] === 0xD8 ? 'image/jpeg' : 'image/webp';
+}
+
 class RTSPStreamPlayer {
     constructor(canvasId, brokerUrl, streamId) {
         this.canvas = document.getElementById(canvasId);
@@ -105,8 +114,8 @@ class RTSPStreamPlayer {
      */
     async handleFrame(arrayBuffer) {
         try {
-            // event.data adalah ArrayBuffer
-            const blob = new Blob([arrayBuffer], { type: 'image/webp' });
+            // event.data adalah ArrayBuffer (WebP atau JPEG)
+            const blob = new Blob([arrayBuffer], { type: detectImageType(arrayBuffer) });
             
             // PENTING (Performa): createImageBitmap men-decode gambar di background thread
             // Ini mencegah main thread (UI) menjadi patah-patah